@@ -23,11 +23,18 @@ from twisted.internet import defer
 
 
 def deferred_await(self):
-    # if a deferred is awaited from a asyncio loop context, we must return
-    # the future wrapper, but if it is awaited from normal twisted loop
-    # we must return self.
-    if isinstance(asyncio.get_event_loop(), AsyncIOLoopWithTwisted):
-        return self.asFuture(asyncio.get_event_loop())
+    # if a deferred is awaited from an asyncio task, we must return the
+    # iterator of the future wrapper, but if it is awaited from a coroutine
+    # driven by twisted (e.g. through defer.ensureDeferred) we must return
+    # self, even if an asyncio loop is running.
+    #
+    # asyncio.get_event_loop() is not used because it throws if the event loop
+    # has been unset and otherwise creates a new loop for the main thread which
+    # nobody would close. AsyncIOLoopWithTwisted is the running loop once it
+    # has been started.
+    loop = events._get_running_loop()
+    if isinstance(loop, AsyncIOLoopWithTwisted) and asyncio.current_task(loop) is not None:
+        return self.asFuture(loop).__await__()
     return self
 
 
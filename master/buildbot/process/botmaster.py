@@ -90,6 +90,10 @@ class BotMaster(service.ReconfigurableServiceMixin, service.AsyncMultiService, L
         # builders maps Builder names to instances of bb.p.builder.Builder,
         # which is the master-side object that defines and controls a build.
 
+        # bumped whenever the set of builders or their configuration may have
+        # changed, so that workers can skip looking up their builders otherwise
+        self.builders_version = 0
+
         self.watchers = {}
 
         self.shuttingDown = False
@@ -294,6 +298,8 @@ class BotMaster(service.ReconfigurableServiceMixin, service.AsyncMultiService, L
                 yield builder.setServiceParent(self)
 
         self.builderNames = list(self.builders)
+        # the workernames of the existing builders may have changed too
+        self.builders_version += 1
 
         yield self.master.data.updates.updateBuilderList(
             self.master.masterid,
@@ -332,6 +338,16 @@ class BotMaster(service.ReconfigurableServiceMixin, service.AsyncMultiService, L
         builders = self.getBuildersForWorker(worker_name)
         self.brd.maybeStartBuildsOn([b.name for b in builders])
 
+    def hasPendingBuildsForWorker(self, worker_name):
+        """
+        Return True if builds may be about to start on any of the builders of a
+        particular worker.
+
+        @param worker_name: the name of the worker
+        """
+        builders = self.getBuildersForWorker(worker_name)
+        return self.brd.hasPendingBuilders([b.name for b in builders])
+
     def maybeStartBuildsForAllBuilders(self):
         """
         Call this when something suggests that this would be a good time to
@@ -24,6 +24,7 @@ from twisted.python import log
 from twisted.python.failure import Failure
 
 from buildbot.data import resultspec
+from buildbot.interfaces import ILatentWorker
 from buildbot.process import metrics
 from buildbot.process.buildrequest import BuildRequest
 from buildbot.util import deferwaiter
@@ -32,6 +33,17 @@ from buildbot.util import service
 from buildbot.util.async_sort import async_sort
 
 
+def _default_next_worker(bldr, workers, buildrequest):
+    if not workers:
+        return None
+
+    # Don't start a new latent worker instance if any other worker, either a non-latent one or a
+    # latent one that is already substantiated, could take the build.
+    candidates = [wfb for wfb in workers
+                  if not ILatentWorker.providedBy(wfb.worker) or wfb.worker.substantiated]
+    return random.choice(candidates or workers)
+
+
 class BuildChooserBase:
     #
     # WARNING: This API is experimental and in active development.
@@ -140,7 +152,7 @@ class BuildChooserBase:
 
 class BasicBuildChooser(BuildChooserBase):
     # BasicBuildChooser generates build pairs via the configuration points:
-    #   * config.nextWorker  (or random.choice if not set)
+    #   * config.nextWorker  (or _default_next_worker if not set)
     #   * config.nextBuild  (or "pop top" if not set)
     #
     # For N workers, this will call nextWorker at most N times. If nextWorker
@@ -159,8 +171,7 @@ class BasicBuildChooser(BuildChooserBase):
 
         self.nextWorker = self.bldr.config.nextWorker
         if not self.nextWorker:
-            self.nextWorker = lambda _, workers, __: random.choice(
-                workers) if workers else None
+            self.nextWorker = _default_next_worker
 
         self.workerpool = self.bldr.getAvailableWorkers()
 
@@ -293,6 +304,9 @@ class BuildRequestDistributor(service.AsyncMultiService):
         # sorted list of names of builders that need their maybeStartBuild
         # method invoked.
         self._pending_builders = []
+        # names of builders taken from _pending_builders by the activity loop that have not yet
+        # been fully processed
+        self._activity_pending_builders = []
         self.activity_lock = defer.DeferredLock()
         self.active = False
 
@@ -331,6 +345,16 @@ class BuildRequestDistributor(service.AsyncMultiService):
         except Exception as e:  # pragma: no cover
             log.err(e, f"while starting builds on {new_builders}")
 
+    def hasPendingBuilders(self, buildernames):
+        """
+        Return True if any of the given builders is waiting for an attempt to
+        start builds on it, or such an attempt is in progress.
+
+        @param buildernames: names of the builders to check
+        """
+        return any(name in self._pending_builders or name in self._activity_pending_builders
+                   for name in buildernames)
+
     @defer.inlineCallbacks
     def _maybeStartBuildsOn(self, new_builders):
         new_builders = set(new_builders)
@@ -440,9 +464,10 @@ class BuildRequestDistributor(service.AsyncMultiService):
                 # we make a copy of it, as it could be modified meanwhile
                 pending_builders = copy.copy(self._pending_builders)
                 self._pending_builders = []
+                self._activity_pending_builders = pending_builders
                 self.pending_builders_lock.release()
 
-            bldr_name = pending_builders.pop(0)
+            bldr_name = pending_builders[0]
 
             # get the actual builder object
             bldr = self.botmaster.builders.get(bldr_name)
@@ -452,10 +477,12 @@ class BuildRequestDistributor(service.AsyncMultiService):
             except Exception:
                 log.err(Failure(), f"from maybeStartBuild for builder '{bldr_name}'")
 
+            pending_builders.pop(0)
             self.activity_lock.release()
 
         timer.stop()
 
+        self._activity_pending_builders = []
         self.active = False
 
     @defer.inlineCallbacks
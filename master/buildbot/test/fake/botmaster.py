@@ -26,6 +26,7 @@ class FakeBotMaster(service.AsyncMultiService, botmaster.LockRetrieverMixin):
         super().__init__()
         self.setName("fake-botmaster")
         self.builders = {}  # dictionary mapping worker names to builders
+        self.builders_version = 0
         self.buildsStartedForWorkers = []
         self.delayShutdown = False
 
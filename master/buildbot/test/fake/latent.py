@@ -53,7 +53,7 @@ class LatentController(SeverWorkerConnectionMixin):
     """
 
     def __init__(self, case, name, kind=None, build_wait_timeout=600,
-                 starts_without_substantiate=None, **kwargs):
+                 starts_without_substantiate=None, reuses_recent_instance=None, **kwargs):
         self.case = case
         self.build_wait_timeout = build_wait_timeout
         self.has_crashed = False
@@ -63,6 +63,9 @@ class LatentController(SeverWorkerConnectionMixin):
         if starts_without_substantiate is not None:
             self.worker.starts_without_substantiate = \
                 starts_without_substantiate
+        if reuses_recent_instance is not None:
+            self.worker.reuses_recent_instance = reuses_recent_instance
+        self.previous_instance = None
 
         self.state = States.STOPPED
         self.auto_stop_flag = False
@@ -204,7 +207,8 @@ class ControllableLatentWorker(AbstractLatentWorker):
         curr_kind = yield self._controller.get_started_kind()
         return requested_kind == curr_kind
 
-    def start_instance(self, build):
+    def start_instance(self, build, previous_instance=None):
+        self._controller.previous_instance = previous_instance
         self._controller.setup_kind(build)
 
         assert self._controller.state == States.STOPPED
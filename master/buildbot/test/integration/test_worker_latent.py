@@ -15,6 +15,8 @@
 
 from parameterized import parameterized
 
+import mock
+
 from twisted.internet import defer
 from twisted.python.failure import Failure
 from twisted.spread import pb
@@ -662,6 +664,30 @@ class Latent(TimeoutableTestCase, RunFakeMasterTestCase):
         yield controller.start_instance(False)
         yield controller.auto_stop(True)
 
+    @defer.inlineCallbacks
+    def test_stalled_substantiation_notifies_missing(self):
+        """
+        A timed out substantiation notifies about the missing worker whenever
+        notify_on_missing is given, even as a single empty string.
+        """
+        controller, builder_id = yield self.create_single_worker_config(
+            controller_kwargs=dict(notify_on_missing=''))
+
+        worker_missing = mock.Mock(return_value=defer.succeed(None))
+        self.patch(self.master.data.updates, 'workerMissing', worker_missing)
+
+        yield self.create_build_request([builder_id])
+        self.reactor.advance(controller.worker.missing_timeout)
+        self.flushLoggedErrors(defer.TimeoutError)
+
+        worker_missing.assert_called_once_with(
+            workerid=controller.worker.workerid,
+            masterid=self.master.masterid,
+            last_connection="Latent worker never connected",
+            notify=[''])
+        yield controller.start_instance(False)
+        yield controller.auto_stop(True)
+
     @defer.inlineCallbacks
     def test_stalled_substantiation_then_check_instance_fails_get_requeued(self):
         """
@@ -1108,6 +1134,182 @@ class Latent(TimeoutableTestCase, RunFakeMasterTestCase):
         yield controller.stop_instance(True)
         yield d
 
+    @defer.inlineCallbacks
+    def test_build_wait_timeout_grace_postpones_insubstantiation(self):
+        """
+        If builds may be about to start on the worker when build_wait_timeout
+        expires, insubstantiation is postponed by build_wait_timeout_grace.
+        """
+        controller, builder_id = yield self.create_single_worker_config(
+            controller_kwargs=dict(build_wait_timeout=5, build_wait_timeout_grace=1))
+
+        yield self.create_build_request([builder_id])
+        yield controller.start_instance(True)
+        yield self.assertBuildResults(1, SUCCESS)
+
+        has_pending_builds = True
+        self.patch(self.master.botmaster, 'hasPendingBuildsForWorker',
+                   lambda name: has_pending_builds)
+
+        self.reactor.advance(5)
+        self.assertTrue(controller.started)
+        self.reactor.advance(1)
+        self.assertTrue(controller.started)
+
+        has_pending_builds = False
+        self.reactor.advance(1)
+        self.assertTrue(controller.stopping)
+        yield controller.stop_instance(True)
+
+    @defer.inlineCallbacks
+    def test_recent_instance_passed_to_start_instance(self):
+        """
+        If the worker is substantiated again shortly after being
+        insubstantiated, the value returned by stop_instance is passed back to
+        start_instance.
+        """
+        controller, builder_id = yield self.create_single_worker_config(
+            controller_kwargs=dict(build_wait_timeout=1, reuses_recent_instance=True))
+
+        yield self.create_build_request([builder_id])
+        self.assertIsNone(controller.previous_instance)
+        yield controller.start_instance(True)
+        yield self.assertBuildResults(1, SUCCESS)
+        self.reactor.advance(1)
+        yield controller.stop_instance('instance-1')
+
+        self.reactor.advance(29)
+        yield self.create_build_request([builder_id])
+        self.assertEqual(controller.previous_instance, 'instance-1')
+        yield controller.start_instance(True)
+        yield self.assertBuildResults(2, SUCCESS)
+        self.reactor.advance(1)
+        yield controller.stop_instance('instance-2')
+
+        self.reactor.advance(30)
+        yield self.create_build_request([builder_id])
+        self.assertIsNone(controller.previous_instance)
+        yield controller.start_instance(True)
+        yield self.assertBuildResults(3, SUCCESS)
+        self.reactor.advance(1)
+        yield controller.stop_instance(True)
+
+    @defer.inlineCallbacks
+    def test_update_worker_skips_unchanged_builders(self):
+        """
+        updateWorker only looks up the builders of the worker again after
+        they may have changed.
+        """
+        controller, builder_id = yield self.create_single_worker_config(
+            controller_kwargs=dict(build_wait_timeout=1))
+
+        get_builders = mock.Mock(wraps=self.master.botmaster.getBuildersForWorker)
+        self.patch(self.master.botmaster, 'getBuildersForWorker', get_builders)
+
+        yield controller.worker.updateWorker()
+        get_builders.assert_not_called()
+
+        # the builders forget the worker, e.g. when it is disconnected
+        self.master.botmaster.workerLost(controller.worker)
+        self.assertEqual(controller.worker.workerforbuilders, {})
+
+        yield controller.worker.updateWorker()
+        get_builders.assert_called_once_with('local')
+        self.assertEqual(list(controller.worker.workerforbuilders), ['testy'])
+
+        yield self.create_build_request([builder_id])
+        yield controller.start_instance(True)
+        yield self.assertBuildResults(1, SUCCESS)
+        self.reactor.advance(1)
+        yield controller.stop_instance(True)
+
+    @defer.inlineCallbacks
+    def test_reconfig_adds_worker_to_existing_builder(self):
+        """
+        If a reconfig adds the worker to an existing builder, the worker is
+        picked up by that builder even though no builder was added.
+        """
+        controller = LatentController(self, 'local', build_wait_timeout=1)
+        other_controller = LatentController(self, 'other')
+        config_dict = {
+            'builders': [
+                BuilderConfig(name="testy-1",
+                              workernames=["local"],
+                              factory=BuildFactory(),
+                              ),
+                BuilderConfig(name="testy-2",
+                              workernames=["other"],
+                              factory=BuildFactory(),
+                              ),
+            ],
+            'workers': [controller.worker, other_controller.worker],
+            'protocols': {'null': {}},
+            # Disable checks about missing scheduler.
+            'multiMaster': True,
+        }
+        yield self.setup_master(config_dict)
+        builder_id = yield self.master.data.updates.findBuilderId('testy-2')
+        self.assertEqual(list(controller.worker.workerforbuilders), ['testy-1'])
+
+        config_dict['builders'][1] = BuilderConfig(name="testy-2",
+                                                   workernames=["local"],
+                                                   factory=BuildFactory(),
+                                                   )
+        yield self.reconfig_master(config_dict)
+        self.assertEqual(sorted(controller.worker.workerforbuilders), ['testy-1', 'testy-2'])
+
+        yield self.create_build_request([builder_id])
+        self.assertTrue(controller.starting)
+        yield controller.start_instance(True)
+        yield self.assertBuildResults(1, SUCCESS)
+        self.reactor.advance(1)
+        yield controller.stop_instance(True)
+
+    @defer.inlineCallbacks
+    def test_remove_busy_workerforbuilder_not_registered(self):
+        """
+        A busy workerforbuilder is no longer counted as building once it is
+        removed, even if another one is registered for its builder.
+        """
+        controller, _ = yield self.create_single_worker_config()
+        worker = controller.worker
+
+        stale_wfb = mock.Mock(builder_name='testy')
+        stale_wfb.isBusy.return_value = True
+        worker.buildStarted(stale_wfb)
+        self.assertEqual(worker.building, {stale_wfb})
+
+        worker.removeWorkerForBuilder(stale_wfb)
+        self.assertEqual(worker.building, set())
+
+    @defer.inlineCallbacks
+    def test_add_idle_workerforbuilder_previously_busy(self):
+        """
+        A workerforbuilder that is added again while not busy is no longer
+        counted as building.
+        """
+        controller, _ = yield self.create_single_worker_config()
+        worker = controller.worker
+
+        wfb = mock.Mock(builder_name='other')
+        wfb.isBusy.return_value = True
+        worker.buildStarted(wfb)
+        self.assertEqual(worker.building, {wfb})
+
+        wfb.isBusy.return_value = False
+        worker.addWorkerForBuilder(wfb)
+        self.assertEqual(worker.building, set())
+
+    @defer.inlineCallbacks
+    def test_run_blocking(self):
+        controller, _ = yield self.create_single_worker_config()
+
+        def blocking(a, b=0):
+            return a + b
+
+        res = yield controller.worker._run_blocking(blocking, 1, b=2)
+        self.assertEqual(res, 3)
+
     @defer.inlineCallbacks
     def test_stop_instance_synchronous_exception(self):
         """
@@ -1343,6 +1545,18 @@ class Latent(TimeoutableTestCase, RunFakeMasterTestCase):
         yield controller.stop_instance(True)
 
 
+class LatentWithAsyncio(Latent):
+
+    """
+    Runs the latent worker tests while an asyncio loop is running, as is the
+    case when graphql is enabled.
+    """
+
+    def setUp(self):
+        self.setup_test_reactor(use_asyncio=True)
+        self.setupDebugIntegrationLogs()
+
+
 class LatentWithLatentMachine(TimeoutableTestCase, RunFakeMasterTestCase):
 
     def tearDown(self):
@@ -184,6 +184,7 @@ class TestBotMaster(TestReactorMixin, unittest.TestCase):
         self.new_config.builders = [bc]
 
         yield self.botmaster.reconfigServiceBuilders(self.new_config)
+        self.assertEqual(self.botmaster.builders_version, 1)
 
         bldr = self.botmaster.builders['bldr']
         self.assertIdentical(bldr.parent, self.botmaster)
@@ -193,6 +194,7 @@ class TestBotMaster(TestReactorMixin, unittest.TestCase):
         self.new_config.builders = []
 
         yield self.botmaster.reconfigServiceBuilders(self.new_config)
+        self.assertEqual(self.botmaster.builders_version, 2)
 
         self.assertIdentical(bldr.parent, None)
         self.assertIdentical(bldr.master, None)
@@ -219,6 +221,20 @@ class TestBotMaster(TestReactorMixin, unittest.TestCase):
         self.botmaster.getBuildersForWorker.assert_called_once_with('centos')
         brd.maybeStartBuildsOn.assert_called_once_with(['frank', 'larry'])
 
+    def test_hasPendingBuildsForWorker(self):
+        brd = self.botmaster.brd = mock.Mock()
+        brd.hasPendingBuilders.return_value = True
+        b1 = mock.Mock(name='frank')
+        b1.name = 'frank'
+        b2 = mock.Mock(name='larry')
+        b2.name = 'larry'
+        self.botmaster.getBuildersForWorker = mock.Mock(return_value=[b1, b2])
+
+        self.assertTrue(self.botmaster.hasPendingBuildsForWorker('centos'))
+
+        self.botmaster.getBuildersForWorker.assert_called_once_with('centos')
+        brd.hasPendingBuilders.assert_called_once_with(['frank', 'larry'])
+
     def test_maybeStartBuildsForAll(self):
         brd = self.botmaster.brd = mock.Mock()
         self.botmaster.builderNames = ['frank', 'larry']
@@ -20,9 +20,11 @@ import mock
 from twisted.internet import defer
 from twisted.python import failure
 from twisted.trial import unittest
+from zope.interface import implementer
 
 from buildbot import config
 from buildbot.db import buildrequests
+from buildbot.interfaces import ILatentWorker
 from buildbot.process import buildrequestdistributor
 from buildbot.process import factory
 from buildbot.test import fakedb
@@ -44,6 +46,13 @@ def nth_worker(n):
     return pick_nth_by_name
 
 
+@implementer(ILatentWorker)
+class FakeLatentWorker:
+
+    def __init__(self, substantiated):
+        self.substantiated = substantiated
+
+
 class TestBRDBase(TestReactorMixin, unittest.TestCase):
 
     def setUp(self):
@@ -91,8 +100,9 @@ class TestBRDBase(TestReactorMixin, unittest.TestCase):
     def addWorkers(self, workerforbuilders):
         """C{workerforbuilders} maps name : available"""
         for name, avail in workerforbuilders.items():
-            wfb = mock.Mock(spec=['isAvailable'], name=name)
+            wfb = mock.Mock(spec=['isAvailable', 'worker'], name=name)
             wfb.name = name
+            wfb.worker = None
             wfb.isAvailable.return_value = avail
             for bldr in self.builders.values():
                 bldr.workers.append(wfb)
@@ -245,6 +255,26 @@ class Test(TestBRDBase):
                          ['bldr3', 'bldr1', 'bldr2', 'bldr3'])
         self.checkAllCleanedUp()
 
+    @defer.inlineCallbacks
+    def test_hasPendingBuilders(self):
+        self.addBuilders(['bldr1', 'bldr2', 'bldr3'])
+        pending = []
+
+        def _maybeStartBuildsOnBuilder(bldr):
+            pending.append((bldr.name,
+                            self.brd.hasPendingBuilders(['bldr1']),
+                            self.brd.hasPendingBuilders(['bldr2', 'bldr3'])))
+            return fireEventually()
+        self.brd._maybeStartBuildsOnBuilder = _maybeStartBuildsOnBuilder
+
+        self.assertFalse(self.brd.hasPendingBuilders(['bldr1', 'bldr2']))
+        yield self.brd.maybeStartBuildsOn(['bldr1', 'bldr2'])
+
+        yield self.brd._waitForFinish()
+        self.assertEqual(pending, [('bldr1', True, True), ('bldr2', False, True)])
+        self.assertFalse(self.brd.hasPendingBuilders(['bldr1', 'bldr2']))
+        self.checkAllCleanedUp()
+
     @defer.inlineCallbacks
     def test_maybeStartBuildsOn_builders_missing(self):
         self.useMock_maybeStartBuildsOnBuilder()
@@ -727,7 +757,8 @@ class TestMaybeStartBuilds(TestBRDBase):
 
     # nextWorker
     @defer.inlineCallbacks
-    def do_test_nextWorker(self, nextWorker, exp_choice=None, exp_warning=False):
+    def do_test_nextWorker(self, nextWorker, exp_choice=None, exp_warning=False,
+                           latent_workers=None):
 
         def makeBuilderConfig():
             return config.BuilderConfig(name='bldrconf',
@@ -746,6 +777,9 @@ class TestMaybeStartBuilds(TestBRDBase):
                                              builder_config=builder_config)
         for i in range(4):
             self.addWorkers({f'test-worker{i}': 1})
+        if latent_workers is not None:
+            for i, substantiated in latent_workers.items():
+                self.bldr.workers[i].worker = FakeLatentWorker(substantiated)
 
         rows = [
             fakedb.SourceStamp(id=21),
@@ -774,6 +808,30 @@ class TestMaybeStartBuilds(TestBRDBase):
         self.patch(random, 'choice', nth_worker(2))
         return self.do_test_nextWorker(None, exp_choice=2)
 
+    def test_nextWorker_default_skips_unsubstantiated_latent_workers(self):
+        self.patch(random, 'choice', nth_worker(0))
+        return self.do_test_nextWorker(None, exp_choice=3,
+                                       latent_workers={0: False, 1: False, 2: False})
+
+    @defer.inlineCallbacks
+    def test_nextWorker_default_mixed_pool(self):
+        choices = []
+
+        def choice(workers):
+            choices.append(sorted(wfb.name for wfb in workers))
+            return nth_worker(1)(workers)
+        self.patch(random, 'choice', choice)
+
+        # the non-latent worker is not passed over for the substantiated latent one
+        yield self.do_test_nextWorker(None, exp_choice=3,
+                                      latent_workers={0: True, 1: False, 2: False})
+        self.assertEqual(choices, [['test-worker0', 'test-worker3']])
+
+    def test_nextWorker_default_no_substantiated_latent_worker(self):
+        self.patch(random, 'choice', nth_worker(2))
+        return self.do_test_nextWorker(None, exp_choice=2,
+                                       latent_workers={0: False, 1: False, 2: False, 3: False})
+
     def test_nextWorker_simple(self):
         def nextWorker(bldr, lst, br=None):
             self.assertIdentical(bldr, self.bldr)
@@ -112,3 +112,43 @@ class TestAsyncioTestLoop(TestReactorMixin, unittest.TestCase):
     def test_asyncio_as_deferred_default(self):
         res = yield as_deferred("OK")
         self.assertEqual(res, "OK")
+
+    @defer.inlineCallbacks
+    def test_await_deferred_from_task(self):
+        d = defer.Deferred()
+
+        async def coro():
+            return (await d)
+
+        f = asyncio.ensure_future(coro())
+        d.callback("OK")
+        res = yield defer.Deferred.fromFuture(f)
+        self.assertEqual(res, "OK")
+
+    def test_await_deferred_from_twisted_coroutine(self):
+        d = defer.Deferred()
+
+        async def coro():
+            return (await d)
+
+        d_coro = defer.ensureDeferred(coro())
+        self.assertNoResult(d_coro)
+        d.callback("OK")
+        self.assertEqual(self.successResultOf(d_coro), "OK")
+
+
+class TestDeferredAwaitWithoutLoop(unittest.TestCase):
+
+    def setUp(self):
+        asyncio.set_event_loop(None)
+
+    def test_await_deferred(self):
+        d = defer.Deferred()
+
+        async def coro():
+            return (await d)
+
+        d_coro = defer.ensureDeferred(coro())
+        self.assertNoResult(d_coro)
+        d.callback("OK")
+        self.assertEqual(self.successResultOf(d_coro), "OK")
@@ -0,0 +1,57 @@
+# This file is part of Buildbot.  Buildbot is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright Buildbot Team Members
+
+
+from twisted.internet import defer
+from twisted.trial import unittest
+
+from buildbot.util.twisted import async_to_deferred
+
+
+class AsyncToDeferred(unittest.TestCase):
+
+    def test_returns_deferred_with_result(self):
+        @async_to_deferred
+        async def fn(value):
+            return (await defer.succeed(value)) + 1
+
+        d = fn(1)
+        self.assertIsInstance(d, defer.Deferred)
+        self.assertEqual(self.successResultOf(d), 2)
+
+    def test_exception_errbacks(self):
+        @async_to_deferred
+        async def fn():
+            raise RuntimeError('oops')
+
+        self.failureResultOf(fn(), RuntimeError)
+
+    def test_starts_eagerly(self):
+        called = []
+
+        @async_to_deferred
+        async def fn():
+            called.append(True)
+            await defer.Deferred()
+
+        fn()
+        self.assertEqual(called, [True])
+
+    def test_bad_arguments_errback(self):
+        @async_to_deferred
+        async def fn():
+            pass
+
+        self.failureResultOf(fn(1), TypeError)
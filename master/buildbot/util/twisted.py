@@ -0,0 +1,35 @@
+# This file is part of Buildbot.  Buildbot is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright Buildbot Team Members
+
+from functools import wraps
+
+from twisted.internet import defer
+
+
+def async_to_deferred(fn):
+    """Decorate an ``async def`` function so that calling it returns a Deferred.
+
+    The coroutine is started immediately, exactly as an ``@defer.inlineCallbacks``
+    function would be, so that callers which ignore the returned Deferred still
+    get the function executed.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return defer.ensureDeferred(fn(*args, **kwargs))
+        except Exception as e:
+            return defer.fail(e)
+
+    return wrapper
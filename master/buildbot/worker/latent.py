@@ -19,27 +19,37 @@ import random
 import string
 
 from twisted.internet import defer
+from twisted.internet import threads
+from twisted.logger import Logger
 from twisted.python import failure
-from twisted.python import log
 from zope.interface import implementer
 
 from buildbot.interfaces import ILatentMachine
 from buildbot.interfaces import ILatentWorker
 from buildbot.interfaces import LatentWorkerFailedToSubstantiate
 from buildbot.interfaces import LatentWorkerSubstantiatiationCancelled
-from buildbot.util import Notifier
 from buildbot.util import deferwaiter
+from buildbot.util.twisted import async_to_deferred
 from buildbot.worker.base import AbstractWorker
 
+log = Logger()
 
-class States(enum.Enum):
+_PASSWORD_ALPHABET = string.ascii_letters + string.digits
+
+
+def _cancelled_failure():
+    # The exception is never raised, so no traceback or stack is captured. A new Failure is
+    # created each time, as waiters may store or re-raise it.
+    return failure.Failure(LatentWorkerSubstantiatiationCancelled())
+
+
+class States(enum.IntEnum):
     # Represents the states of AbstractLatentWorker
 
     NOT_SUBSTANTIATED = 0
 
-    # When in this state, self._substantiation_notifier is waited on. The
-    # notifier is notified immediately after the state transition out of
-    # SUBSTANTIATING.
+    # When in this state, the substantiation deferreds are waited on. They are
+    # fired immediately after the state transition out of SUBSTANTIATING.
     SUBSTANTIATING = 1
 
     # This is the same as SUBSTANTIATING, the difference is that start_instance
@@ -59,7 +69,7 @@ class States(enum.Enum):
     #
     # When in this state, self._start_stop_lock is held.
     #
-    # When in this state self.substantiation_build is not None.
+    # When in this state self._pending_substantiation_build holds the build to substantiate for.
     INSUBSTANTIATING_SUBSTANTIATING = 5
 
     # This state represents a worker that is shut down. Effectively, it's NOT_SUBSTANTIATED
@@ -67,6 +77,22 @@ class States(enum.Enum):
     SHUT_DOWN = 6
 
 
+# Groups of states that are checked together on the state machine paths. These are frozensets
+# so that the membership tests neither allocate nor scan.
+_NOT_RUNNING_STATES = frozenset([States.NOT_SUBSTANTIATED, States.SHUT_DOWN])
+
+_SUBSTANTIATING_STATES = frozenset([States.SUBSTANTIATING, States.SUBSTANTIATING_STARTING])
+
+_SUBSTANTIATION_PENDING_STATES = frozenset([States.SUBSTANTIATING,
+                                            States.SUBSTANTIATING_STARTING,
+                                            States.INSUBSTANTIATING_SUBSTANTIATING])
+
+_INSUBSTANTIATING_STATES = frozenset([States.INSUBSTANTIATING,
+                                      States.INSUBSTANTIATING_SUBSTANTIATING])
+
+_INSTANCE_STARTED_STATES = frozenset([States.SUBSTANTIATING_STARTING, States.SUBSTANTIATED])
+
+
 @implementer(ILatentWorker)
 class AbstractLatentWorker(AbstractWorker):
 
@@ -82,7 +108,9 @@ class AbstractLatentWorker(AbstractWorker):
     See ec2.py for a concrete example.
     """
 
-    substantiation_build = None
+    # Only set while in INSUBSTANTIATING_SUBSTANTIATING state. Cleared by the insubstantiation
+    # holding self._start_stop_lock when it completes.
+    _pending_substantiation_build = None
     build_wait_timer = None
     start_missing_on_startup = False
 
@@ -91,6 +119,15 @@ class AbstractLatentWorker(AbstractWorker):
     # latent machines.
     starts_without_substantiate = False
 
+    # override if start_instance accepts a previous_instance keyword argument. The value
+    # returned by stop_instance is then passed back to start_instance if the worker is
+    # substantiated again within recent_instance_timeout seconds, so that the backend may
+    # restart the same instance instead of creating a new one.
+    reuses_recent_instance = False
+    recent_instance_timeout = 30
+    _recent_instance = None
+    _recent_instance_until = 0.0
+
     # Caveats: The handling of latent workers is much more complex than it
     # might seem. The code must handle at least the following conditions:
     #
@@ -160,27 +197,47 @@ class AbstractLatentWorker(AbstractWorker):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._substantiation_notifier = Notifier()
+        # Usually only a single caller waits for substantiation, the rest go to
+        # _extra_substantiation_waiters.
+        self._substantiation_deferred = None
+        self._extra_substantiation_waiters = []
         self._start_stop_lock = defer.DeferredLock()
         self._deferwaiter = deferwaiter.DeferWaiter()
         self._check_instance_timer = None
+        # entries of self.workerforbuilders that are busy, kept up to date so
+        # that neither the hot paths nor self.building need to scan all builders
+        self._busy_wfbs = set()
+        self._last_builders_version = None
 
     def checkConfig(self, name, password,
                     build_wait_timeout=60 * 10,
+                    build_wait_timeout_grace=0,
                     check_instance_interval=10,
                     **kwargs):
         super().checkConfig(name, password, **kwargs)
 
     def reconfigService(self, name, password,
                         build_wait_timeout=60 * 10,
+                        build_wait_timeout_grace=0,
                         check_instance_interval=10,
                         **kwargs):
         self.build_wait_timeout = build_wait_timeout
+        self.build_wait_timeout_grace = build_wait_timeout_grace
+        # build_wait_timeout is only ever looked at by its sign, so classify it once here
+        # instead of comparing it on every state transition.
+        self._wait_never_disconnect = build_wait_timeout < 0
+        self._wait_no_timer = build_wait_timeout <= 0
+        self._wait_immediate_disconnect = build_wait_timeout == 0
         self.check_instance_interval = check_instance_interval
+        # same normalization as AbstractWorker.reconfigService applies
+        notify_on_missing = kwargs.get('notify_on_missing')
+        if isinstance(notify_on_missing, str):
+            notify_on_missing = [notify_on_missing]
+        self._should_notify_on_missing = bool(notify_on_missing)
         return super().reconfigService(name, password, **kwargs)
 
     def _generate_random_password(self):
-        return ''.join(random.choice(string.ascii_letters + string.digits) for _ in range(20))
+        return ''.join(random.choices(_PASSWORD_ALPHABET, k=20))
 
     def getRandomPass(self):
         """
@@ -191,43 +248,71 @@ class AbstractLatentWorker(AbstractWorker):
         # We should return an existing password if we're reconfiguring a substantiated worker.
         # Otherwise the worker may be rejected if its password was changed during substantiation.
         # To simplify, we only allow changing passwords for workers that aren't substantiated.
-        if self.state not in [States.NOT_SUBSTANTIATED, States.SHUT_DOWN]:
+        if self.state not in _NOT_RUNNING_STATES:
             if self.password is not None:
                 return self.password
 
             # pragma: no cover
-            log.err('{}: could not reuse password of substantiated worker (password == None)',
-                    repr(self))
+            log.error('{worker!r}: could not reuse password of substantiated worker '
+                      '(password == None)', worker=self)
 
         return self._generate_random_password()
 
     @property
     def building(self):
         # A LatentWorkerForBuilder will only be busy if it is building.
-        return {wfb for wfb in self.workerforbuilders.values()
-                if wfb.isBusy()}
+        return set(self._busy_wfbs)
+
+    def _discard_busy_wfbs(self, wfb):
+        # wfb may not be the one currently registered for its builder
+        old_wfb = self.workerforbuilders.get(wfb.builder_name)
+        if old_wfb is not None:
+            self._busy_wfbs.discard(old_wfb)
+        self._busy_wfbs.discard(wfb)
+
+    def addWorkerForBuilder(self, wfb):
+        self._discard_busy_wfbs(wfb)
+        super().addWorkerForBuilder(wfb)
+        if wfb.isBusy():
+            self._busy_wfbs.add(wfb)
+
+    def removeWorkerForBuilder(self, wfb):
+        self._discard_busy_wfbs(wfb)
+        super().removeWorkerForBuilder(wfb)
+        # the builder will need to be given this worker again by updateWorker
+        self._last_builders_version = None
 
     def failed_to_start(self, instance_id, instance_state):
-        log.msg(f'{self.__class__.__name__} {self.workername} failed to start instance '
-                f'{instance_id} ({instance_state})')
+        log.info('{cls} {workername} failed to start instance {instance_id} ({instance_state})',
+                 cls=self.__class__.__name__, workername=self.workername,
+                 instance_id=instance_id, instance_state=instance_state)
         raise LatentWorkerFailedToSubstantiate(instance_id, instance_state)
 
     def _log_start_stop_locked(self, action_str):
         if self._start_stop_lock.locked:
-            log.msg(('while {} worker {}: waiting until previous ' +
-                     'start_instance/stop_instance finishes').format(action_str, self))
+            log.info('while {action} worker {worker}: waiting until previous '
+                     'start_instance/stop_instance finishes', action=action_str, worker=self)
 
     def start_instance(self, build):
         # responsible for starting instance that will try to connect with this
         # master.  Should return deferred with either True (instance started)
         # or False (instance not started, so don't run a build here).  Problems
-        # should use an errback.
+        # should use an errback. Blocking calls (e.g. to cloud provider SDKs)
+        # must not be made from the reactor thread, use _run_blocking instead.
         raise NotImplementedError
 
     def stop_instance(self, fast=False):
-        # responsible for shutting down instance.
+        # responsible for shutting down instance. Same as for start_instance,
+        # blocking calls should be made through _run_blocking.
         raise NotImplementedError
 
+    def _run_blocking(self, fn, *args, **kwargs):
+        # runs a blocking function in the reactor thread pool so that other
+        # workers are not stalled while it runs. Returns a deferred with its
+        # result.
+        reactor = self.master.reactor
+        return threads.deferToThreadPool(reactor, reactor.getThreadPool(), fn, *args, **kwargs)
+
     def check_instance(self):
         return True
 
@@ -236,7 +321,7 @@ class AbstractLatentWorker(AbstractWorker):
         return self.state == States.SUBSTANTIATED and self.conn is not None
 
     def substantiate(self, wfb, build):
-        log.msg(f"substantiating worker {wfb}")
+        log.info("substantiating worker {wfb}", wfb=wfb)
 
         if self.state == States.SHUT_DOWN:
             return defer.succeed(False)
@@ -244,22 +329,20 @@ class AbstractLatentWorker(AbstractWorker):
         if self.state == States.SUBSTANTIATED and self.conn is not None:
             return defer.succeed(True)
 
-        if self.state in [States.SUBSTANTIATING,
-                          States.SUBSTANTIATING_STARTING,
-                          States.INSUBSTANTIATING_SUBSTANTIATING]:
-            return self._substantiation_notifier.wait()
+        if self.state in _SUBSTANTIATION_PENDING_STATES:
+            return self._wait_substantiation()
 
         self.startMissingTimer()
 
         # if anything of the following fails synchronously we need to have a
         # deferred ready to be notified
-        d = self._substantiation_notifier.wait()
+        d = self._wait_substantiation()
 
         if self.state == States.SUBSTANTIATED and self.conn is None:
             # connection dropped while we were substantiated.
             # insubstantiate to clean up and then substantiate normally.
             d_ins = self.insubstantiate(force_substantiation_build=build)
-            d_ins.addErrback(log.err, 'while insubstantiating')
+            d_ins.addErrback(self._log_insubstantiation_failure)
             return d
 
         assert self.state in [States.NOT_SUBSTANTIATED,
@@ -270,81 +353,111 @@ class AbstractLatentWorker(AbstractWorker):
             self._substantiate(build)
         else:
             self.state = States.INSUBSTANTIATING_SUBSTANTIATING
-            self.substantiation_build = build
+            self._pending_substantiation_build = build
         return d
 
-    @defer.inlineCallbacks
     def _substantiate(self, build):
         assert self.state == States.SUBSTANTIATING
-        try:
-            # if build_wait_timeout is negative we don't ever disconnect the
-            # worker ourselves, so we don't need to wait for it to attach
-            # to declare it as substantiated.
-            dont_wait_to_attach = \
-                self.build_wait_timeout < 0 and self.conn is not None
-
-            start_success = True
-            if ILatentMachine.providedBy(self.machine):
-                start_success = yield self.machine.substantiate(self)
-
-            try:
-                self._log_start_stop_locked('substantiating')
-                yield self._start_stop_lock.acquire()
-
-                if start_success:
-                    self.state = States.SUBSTANTIATING_STARTING
-                    start_success = yield self.start_instance(build)
-            finally:
-                self._start_stop_lock.release()
 
-            if not start_success:
-                # this behaviour is kept as compatibility, but it is better
-                # to just errback with a workable reason
-                msg = "Worker does not want to substantiate at this time"
-                raise LatentWorkerFailedToSubstantiate(self.name, msg)
-
-            if dont_wait_to_attach and \
-                    self.state == States.SUBSTANTIATING_STARTING and \
-                    self.conn is not None:
-                log.msg(f"Worker {self.name} substantiated (already attached)")
-                self.state = States.SUBSTANTIATED
-                self._fireSubstantiationNotifier(True)
-            else:
-                self._start_check_instance_timer()
+        # if build_wait_timeout is negative we don't ever disconnect the
+        # worker ourselves, so we don't need to wait for it to attach
+        # to declare it as substantiated.
+        dont_wait_to_attach = \
+            self._wait_never_disconnect and self.conn is not None
+
+        if ILatentMachine.providedBy(self.machine):
+            d = defer.maybeDeferred(self.machine.substantiate, self)
+        else:
+            d = defer.succeed(True)
+
+        d.addCallback(self._start_instance_locked, build)
+        d.addCallback(self._on_start_instance_result,
+                      dont_wait_to_attach=dont_wait_to_attach)
+        d.addErrback(self._on_start_instance_failed)
+        return d
+
+    def _start_instance_locked(self, start_success, build):
+        self._log_start_stop_locked('substantiating')
+        return self._start_stop_lock.run(self._start_instance, start_success, build)
+
+    def _start_instance(self, start_success, build):
+        if not start_success:
+            return False
+        self.state = States.SUBSTANTIATING_STARTING
+        if self.reuses_recent_instance:
+            return self.start_instance(build, previous_instance=self._pop_recent_instance())
+        return self.start_instance(build)
+
+    def _pop_recent_instance(self):
+        instance, self._recent_instance = self._recent_instance, None
+        if self.master.reactor.seconds() >= self._recent_instance_until:
+            return None
+        return instance
+
+    def _on_start_instance_result(self, start_success, dont_wait_to_attach):
+        if not start_success:
+            # this behaviour is kept as compatibility, but it is better
+            # to just errback with a workable reason
+            msg = "Worker does not want to substantiate at this time"
+            raise LatentWorkerFailedToSubstantiate(self.name, msg)
+
+        if dont_wait_to_attach and \
+                self.state == States.SUBSTANTIATING_STARTING and \
+                self.conn is not None:
+            log.info("Worker {name} substantiated (already attached)", name=self.name)
+            self.state = States.SUBSTANTIATED
+            self._fireSubstantiationNotifier(True)
+        else:
+            self._start_check_instance_timer()
 
-        except Exception as e:
-            self.stopMissingTimer()
-            self._substantiation_failed(failure.Failure(e))
-            # swallow the failure as it is notified
+    def _on_start_instance_failed(self, f):
+        self.stopMissingTimer()
+        self._substantiation_failed(f)
+        # swallow the failure as it is notified
+
+    def _wait_substantiation(self):
+        d = defer.Deferred()
+        if self._substantiation_deferred is None:
+            self._substantiation_deferred = d
+        else:
+            self._extra_substantiation_waiters.append(d)
+        return d
 
     def _fireSubstantiationNotifier(self, result):
-        if not self._substantiation_notifier:
-            log.msg(f"No substantiation deferred for {self.name}")
+        d, self._substantiation_deferred = self._substantiation_deferred, None
+        if d is None:
+            log.info("No substantiation deferred for {name}", name=self.name)
             return
 
-        result_msg = 'success' if result is True else 'failure'
-        log.msg(f"Firing {self.name} substantiation deferred with {result_msg}")
+        log.info("Firing {name} substantiation deferred with {result_msg}",
+                 name=self.name, result_msg='success' if result is True else 'failure')
 
-        self._substantiation_notifier.notify(result)
+        # the callbacks may start waiting for the next substantiation
+        extra_waiters = self._extra_substantiation_waiters
+        if extra_waiters:
+            self._extra_substantiation_waiters = []
+        d.callback(result)
+        for waiter in extra_waiters:
+            waiter.callback(result)
 
-    @defer.inlineCallbacks
     def attached(self, conn):
         self._stop_check_instance_timer()
 
         if self.state != States.SUBSTANTIATING_STARTING and \
-                self.build_wait_timeout >= 0:
-            msg = (f'Worker {self.name} received connection while not trying to substantiate.'
-                   'Disconnecting.')
-            log.msg(msg)
+                not self._wait_never_disconnect:
+            log.info('Worker {name} received connection while not trying to substantiate. '
+                     'Disconnecting.', name=self.name)
             self._deferwaiter.add(self._disconnect(conn))
-            raise RuntimeError(msg)
+            return defer.fail(RuntimeError(
+                f'Worker {self.name} received connection while not trying to substantiate. '
+                'Disconnecting.'))
 
-        try:
-            yield super().attached(conn)
-        except Exception:
-            self._substantiation_failed(failure.Failure())
-            return
-        log.msg(f"Worker {self.name} substantiated \\o/")
+        d = super().attached(conn)
+        d.addCallbacks(self._on_attached_success, self._on_attached_failed)
+        return d
+
+    def _on_attached_success(self, _):
+        log.info("Worker {name} substantiated \\o/", name=self.name)
 
         # only change state when we are actually substantiating. We could
         # end up at this point in different state than SUBSTANTIATING_STARTING
@@ -353,30 +466,35 @@ class AbstractLatentWorker(AbstractWorker):
         # without master seeing this condition.
         #
         # When build_wait_timeout is not negative, we throw an error (see above)
-        if self.state in [States.SUBSTANTIATING,
-                          States.SUBSTANTIATING_STARTING]:
+        if self.state in _SUBSTANTIATING_STATES:
             self.state = States.SUBSTANTIATED
         self._fireSubstantiationNotifier(True)
 
+    def _on_attached_failed(self, f):
+        self._substantiation_failed(f)
+        # swallow the failure as it is notified
+
     def attachBuilder(self, builder):
         wfb = self.workerforbuilders.get(builder.name)
         return wfb.attached(self, self.worker_commands)
 
+    def _log_insubstantiation_failure(self, f):
+        log.failure('while insubstantiating', f)
+
     def _missing_timer_fired(self):
         self.missing_timer = None
         return self._substantiation_failed(defer.TimeoutError())
 
     def _substantiation_failed(self, failure):
-        if self.state in [States.SUBSTANTIATING,
-                          States.SUBSTANTIATING_STARTING]:
+        if self.state in _SUBSTANTIATING_STATES:
             self._fireSubstantiationNotifier(failure)
 
         d = self.insubstantiate()
-        d.addErrback(log.err, 'while insubstantiating')
+        d.addErrback(self._log_insubstantiation_failure)
         self._deferwaiter.add(d)
 
         # notify people, but only if we're still in the config
-        if not self.parent or not self.notify_on_missing:
+        if not self.parent or not self._should_notify_on_missing:
             return None
 
         return self.master.data.updates.workerMissing(
@@ -388,12 +506,13 @@ class AbstractLatentWorker(AbstractWorker):
 
     def canStartBuild(self):
         # we were disconnected, but all the builds are not yet cleaned up.
-        if self.conn is None and self.building:
+        if self.conn is None and self._busy_wfbs:
             return False
         return super().canStartBuild()
 
     def buildStarted(self, wfb):
         assert wfb.isBusy()
+        self._busy_wfbs.add(wfb)
         self._clearBuildWaitTimer()
 
         if ILatentMachine.providedBy(self.machine):
@@ -401,8 +520,9 @@ class AbstractLatentWorker(AbstractWorker):
 
     def buildFinished(self, wfb):
         assert not wfb.isBusy()
-        if not self.building:
-            if self.build_wait_timeout == 0:
+        self._busy_wfbs.discard(wfb)
+        if not self._busy_wfbs:
+            if self._wait_immediate_disconnect:
                 # we insubstantiate asynchronously to trigger more bugs with
                 # the fake reactor
                 self.master.reactor.callLater(0, self._soft_disconnect)
@@ -424,12 +544,30 @@ class AbstractLatentWorker(AbstractWorker):
                 self.build_wait_timer.cancel()
             self.build_wait_timer = None
 
-    def _setBuildWaitTimer(self):
-        self._clearBuildWaitTimer()
-        if self.build_wait_timeout <= 0:
-            return
+    def _setBuildWaitTimer(self, timeout=None):
+        # same as _clearBuildWaitTimer(), inlined as this runs after every build
+        timer = self.build_wait_timer
+        if timer is not None:
+            if timer.active():
+                timer.cancel()
+            self.build_wait_timer = None
+
+        if timeout is None:
+            if self._wait_no_timer:
+                return
+            timeout = self.build_wait_timeout
         self.build_wait_timer = self.master.reactor.callLater(
-            self.build_wait_timeout, self._soft_disconnect)
+            timeout, self._build_wait_timer_fired)
+
+    def _build_wait_timer_fired(self):
+        self.build_wait_timer = None
+        # A build may be about to start on this worker. Stopping the instance now would only
+        # have it started again right away, so wait a bit more for the build to arrive.
+        if self.build_wait_timeout_grace > 0 and \
+                self.botmaster.hasPendingBuildsForWorker(self.name):
+            self._setBuildWaitTimer(self.build_wait_timeout_grace)
+            return
+        self._soft_disconnect()
 
     def _stop_check_instance_timer(self):
         if self._check_instance_timer is not None:
@@ -476,88 +614,97 @@ class AbstractLatentWorker(AbstractWorker):
         # if check passes, schedule another one until worker connects
         self._start_check_instance_timer()
 
-    @defer.inlineCallbacks
     def insubstantiate(self, fast=False, force_substantiation_build=None):
         # If force_substantiation_build is not None, we'll try to substantiate the given build
         # after insubstantiation concludes. This parameter allows to go directly to the
         # SUBSTANTIATING state without going through NOT_SUBSTANTIATED state.
 
-        log.msg(f"insubstantiating worker {self}")
+        log.info("insubstantiating worker {worker}", worker=self)
+
+        if self.state == States.NOT_SUBSTANTIATED and force_substantiation_build is None:
+            # Nothing to stop. The start/stop lock can't be held in this state, so
+            # _insubstantiate_impl would return right after acquiring it.
+            return defer.succeed(None)
+
+        return self._insubstantiate_impl(fast, force_substantiation_build)
 
+    @async_to_deferred
+    async def _insubstantiate_impl(self, fast, force_substantiation_build):
         if self.state == States.INSUBSTANTIATING_SUBSTANTIATING:
             # there's another insubstantiation ongoing. We'll wait for it to finish by waiting
             # on self._start_stop_lock
             self.state = States.INSUBSTANTIATING
-            self.substantiation_build = None
-            self._fireSubstantiationNotifier(
-                failure.Failure(LatentWorkerSubstantiatiationCancelled()))
+            self._fireSubstantiationNotifier(_cancelled_failure())
 
         try:
             self._log_start_stop_locked('insubstantiating')
-            yield self._start_stop_lock.acquire()
+            await self._start_stop_lock.acquire()
 
-            assert self.state not in [States.INSUBSTANTIATING,
-                                      States.INSUBSTANTIATING_SUBSTANTIATING]
+            assert self.state not in _INSUBSTANTIATING_STATES
 
-            if self.state in [States.NOT_SUBSTANTIATED, States.SHUT_DOWN]:
+            if self.state in _NOT_RUNNING_STATES:
                 return
 
             prev_state = self.state
 
             if force_substantiation_build is not None:
                 self.state = States.INSUBSTANTIATING_SUBSTANTIATING
-                self.substantiation_build = force_substantiation_build
+                self._pending_substantiation_build = force_substantiation_build
             else:
                 self.state = States.INSUBSTANTIATING
 
-            if prev_state in [States.SUBSTANTIATING, States.SUBSTANTIATING_STARTING]:
-                self._fireSubstantiationNotifier(
-                    failure.Failure(LatentWorkerSubstantiatiationCancelled()))
+            if prev_state in _SUBSTANTIATING_STATES:
+                self._fireSubstantiationNotifier(_cancelled_failure())
 
             self._clearBuildWaitTimer()
             self._stop_check_instance_timer()
 
-            if prev_state in [States.SUBSTANTIATING_STARTING, States.SUBSTANTIATED]:
+            if prev_state in _INSTANCE_STARTED_STATES:
                 try:
-                    yield self.stop_instance(fast)
-                except Exception as e:
+                    instance = await defer.maybeDeferred(self.stop_instance, fast)
+                    if self.reuses_recent_instance and instance is not None:
+                        self._recent_instance = instance
+                        self._recent_instance_until = \
+                            self.master.reactor.seconds() + self.recent_instance_timeout
+                except Exception:
                     # The case of failure for insubstantiation is bad as we have a
                     # left-over costing resource There is not much thing to do here
                     # generically, so we must put the problem of stop_instance
                     # reliability to the backend driver
-                    log.err(e, "while insubstantiating")
+                    log.failure("while insubstantiating")
 
-            assert self.state in [States.INSUBSTANTIATING,
-                                  States.INSUBSTANTIATING_SUBSTANTIATING]
+            assert self.state in _INSUBSTANTIATING_STATES
 
             if self.state == States.INSUBSTANTIATING_SUBSTANTIATING:
-                build, self.substantiation_build = self.substantiation_build, None
                 self.state = States.SUBSTANTIATING
-                self._substantiate(build)
+                self._substantiate(self._pending_substantiation_build)
             else:  # self.state == States.INSUBSTANTIATING:
                 self.state = States.NOT_SUBSTANTIATED
 
         finally:
+            # The pending build can only have been set while we held the lock, so it is either
+            # consumed above or belongs to a substantiation that has been cancelled.
+            self._pending_substantiation_build = None
             self._start_stop_lock.release()
 
         self.botmaster.maybeStartBuildsForWorker(self.name)
 
-    @defer.inlineCallbacks
-    def _soft_disconnect(self, fast=False, stopping_service=False):
+    @async_to_deferred
+    async def _soft_disconnect(self, fast=False, stopping_service=False):
         # a negative build_wait_timeout means the worker should never be shut
         # down, so just disconnect.
-        if not stopping_service and self.build_wait_timeout < 0:
-            yield super().disconnect()
+        if not stopping_service and self._wait_never_disconnect:
+            await super().disconnect()
             return
 
         self.stopMissingTimer()
 
         # we add the Deferreds to DeferWaiter because we don't wait for a Deferred if
         # the other Deferred errbacks
-        yield defer.DeferredList([
-            self._deferwaiter.add(super().disconnect()),
+        await defer.gatherResults([
+            self._deferwaiter.add(defer.maybeDeferred(super().disconnect)),
             self._deferwaiter.add(self.insubstantiate(fast))
-        ], consumeErrors=True, fireOnOneErrback=True)
+        ], consumeErrors=True)
 
     def disconnect(self):
         self._deferwaiter.add(self._soft_disconnect())
@@ -565,24 +712,20 @@ class AbstractLatentWorker(AbstractWorker):
         # without a restart (or maybe a sighup)
         self.botmaster.workerLost(self)
 
-    @defer.inlineCallbacks
-    def stopService(self):
+    @async_to_deferred
+    async def stopService(self):
         # stops the service. Waits for any pending substantiations, insubstantiations or builds
         # that are running or about to start to complete.
-        while self.state not in [States.NOT_SUBSTANTIATED, States.SHUT_DOWN]:
-            if self.state in [States.INSUBSTANTIATING,
-                              States.INSUBSTANTIATING_SUBSTANTIATING,
-                              States.SUBSTANTIATING,
-                              States.SUBSTANTIATING_STARTING]:
+        while self.state not in _NOT_RUNNING_STATES:
+            if self.state in _INSUBSTANTIATING_STATES or self.state in _SUBSTANTIATING_STATES:
                 self._log_start_stop_locked('stopService')
-                yield self._start_stop_lock.acquire()
+                await self._start_stop_lock.acquire()
                 self._start_stop_lock.release()
 
-            if self.conn is not None or self.state in [States.SUBSTANTIATED,
-                                                       States.SUBSTANTIATING_STARTING]:
-                yield self._soft_disconnect(stopping_service=True)
+            if self.conn is not None or self.state in _INSTANCE_STARTED_STATES:
+                await self._soft_disconnect(stopping_service=True)
 
-            yield self._deferwaiter.wait()
+            await self._deferwaiter.wait()
 
         # prevent any race conditions with any future builds that are in the process of
         # being started.
@@ -591,7 +734,7 @@ class AbstractLatentWorker(AbstractWorker):
 
         self._clearBuildWaitTimer()
         self._stop_check_instance_timer()
-        res = yield super().stopService()
+        res = await super().stopService()
         return res
 
     def updateWorker(self):
@@ -601,9 +744,12 @@ class AbstractLatentWorker(AbstractWorker):
 
         @return: a Deferred that indicates when an attached worker has
         accepted the new builders and/or released the old ones."""
-        for b in self.botmaster.getBuildersForWorker(self.name):
-            if b.name not in self.workerforbuilders:
-                b.addLatentWorker(self)
+        builders_version = self.botmaster.builders_version
+        if builders_version != self._last_builders_version:
+            self._last_builders_version = builders_version
+            for b in self.botmaster.getBuildersForWorker(self.name):
+                if b.name not in self.workerforbuilders:
+                    b.addLatentWorker(self)
         return super().updateWorker()
 
 
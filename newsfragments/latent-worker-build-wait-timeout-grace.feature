@@ -0,0 +1 @@
+Added ``build_wait_timeout_grace`` option to latent workers that postpones shutting down an idle worker when builds may be about to start on it.
@@ -0,0 +1 @@
+When a builder has no ``nextWorker`` function configured, builds no longer start a new latent worker instance while another worker is available.
@@ -0,0 +1 @@
+Latent workers may now opt into receiving the recently stopped instance in ``start_instance()`` by setting ``reuses_recent_instance`` so that it can be restarted instead of creating a new one.